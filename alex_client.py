@@ -4,7 +4,14 @@ Communicates with ALEX via the Control API on port 9090.
 """
 
 import os
+import socket
+import threading
+import weakref
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool
 
 
 API_BASE = "http://127.0.0.1:9090"
@@ -12,15 +19,105 @@ TIMEOUT_HEALTH = 5
 TIMEOUT_COMMAND = 120  # ALEX can take a while to respond
 
 
+def _is_json(resp):
+    return resp.headers.get("Content-Type", "").startswith("application/json")
+
+
+class _AbortableAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that remembers its sockets, so abort() from another thread
+    can unblock a request (e.g. a long-poll) that is waiting on the server.
+
+    Hooks urllib3 through PoolManager.pool_classes_by_scheme and
+    HTTPConnectionPool.ConnectionCls - both present in urllib3 1.26 and 2.x
+    (checked against 1.26.20 and 2.8.0). Recheck on a urllib3 major upgrade.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._sockets = weakref.WeakSet()
+        self._aborted = False
+        self._lock = threading.Lock()  # abort() runs on another thread
+        adapter = self
+
+        class Connection(HTTPConnection):
+            def connect(self):
+                super().connect()
+                with adapter._lock:
+                    adapter._sockets.add(self.sock)
+                    aborted = adapter._aborted
+                if aborted:
+                    _shutdown(self.sock)
+
+        class Pool(HTTPConnectionPool):
+            ConnectionCls = Connection
+
+        self._pool_cls = Pool
+        super().__init__(*args, **kwargs)
+
+    def _track(self, manager):
+        manager.pool_classes_by_scheme = {
+            **manager.pool_classes_by_scheme, "http": self._pool_cls,
+        }
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self._track(self.poolmanager)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        # Requests routed via http_proxy connect through the proxy manager's
+        # own pools; SOCKS proxies use their own pool classes and aren't hooked
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        if not proxy.lower().startswith("socks"):
+            self._track(manager)
+        return manager
+
+    def abort(self):
+        with self._lock:
+            self._aborted = True
+            sockets = list(self._sockets)
+        for sock in sockets:
+            _shutdown(sock)
+
+
+def _shutdown(sock):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
 class AlexClient:
+    """
+    Keeps one requests.Session so calls reuse a keep-alive connection.
+    Sessions are not shared across threads - give each thread its own client.
+    """
+
     def __init__(self):
         self.base_url = API_BASE
         self.token = os.environ.get("ALEX_API_TOKEN")
+        self._url_health = f"{self.base_url}/api/health"
+        self._url_command = f"{self.base_url}/api/command"
+        self._url_terminal = f"{self.base_url}/api/terminal-messages"
+        self._session = requests.Session()
+        self._adapter = _AbortableAdapter(
+            pool_connections=4, pool_maxsize=8, max_retries=0,
+        )
+        self._session.mount("http://", self._adapter)
+        self._session.headers.update(self._build_headers())
+
+    def close(self):
+        """Release pooled connections."""
+        self._session.close()
 
-    def _headers(self, terminal=True):
-        headers = {"Content-Type": "application/json"}
-        if terminal:
-            headers["X-Terminal"] = "true"
+    def abort(self):
+        """
+        Make any in-flight and future requests fail immediately. Safe to
+        call from another thread; the client is unusable afterwards.
+        """
+        self._adapter.abort()
+
+    def _build_headers(self):
+        headers = {"Content-Type": "application/json", "X-Terminal": "true"}
         if self.token:
             headers["Authorization"] = f"Bearer {self.token}"
         return headers
@@ -28,12 +125,11 @@ class AlexClient:
     def health_check(self):
         """Check if ALEX is online. Returns dict or None."""
         try:
-            resp = requests.get(
-                f"{self.base_url}/api/health",
-                headers=self._headers(),
+            resp = self._session.get(
+                self._url_health,
                 timeout=TIMEOUT_HEALTH,
             )
-            if resp.status_code == 200:
+            if resp.status_code == 200 and _is_json(resp):
                 return resp.json()
         except requests.RequestException:
             pass
@@ -45,15 +141,19 @@ class AlexClient:
         Returns (response_text, error_string).
         """
         try:
-            resp = requests.post(
-                f"{self.base_url}/api/command",
+            resp = self._session.post(
+                self._url_command,
                 json={
                     "message": text,
                     "send_to_telegram": False,
                 },
-                headers=self._headers(),
                 timeout=TIMEOUT_COMMAND,
+                stream=True,
             )
+            if not _is_json(resp):
+                # e.g. an HTML error page - don't download or parse it
+                resp.close()
+                return None, f"HTTP {resp.status_code}"
             data = resp.json()
             if resp.status_code == 200 and data.get("success"):
                 return data.get("response", ""), None
@@ -66,15 +166,19 @@ class AlexClient:
         except Exception as e:
             return None, str(e)
 
-    def get_terminal_messages(self):
-        """Fetch queued autonomous messages from ALEX."""
+    def get_terminal_messages(self, wait=0):
+        """
+        Fetch queued autonomous messages from ALEX.
+        With wait > 0 the server may hold the request (long-poll) for up to
+        `wait` seconds until a message is queued.
+        """
         try:
-            resp = requests.get(
-                f"{self.base_url}/api/terminal-messages",
-                headers=self._headers(),
-                timeout=TIMEOUT_HEALTH,
+            resp = self._session.get(
+                self._url_terminal,
+                params={"wait": wait} if wait else None,
+                timeout=TIMEOUT_HEALTH + wait,
             )
-            if resp.status_code == 200:
+            if resp.status_code == 200 and _is_json(resp):
                 return resp.json().get("messages", [])
         except requests.RequestException:
             pass
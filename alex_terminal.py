@@ -7,81 +7,134 @@ Main PyQt5 application for interacting with ALEX on the Pi.
 import sys
 import os
 import re
-import html
-import time
+import queue
+import threading
 from pathlib import Path
 
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QTextBrowser, QLineEdit, QPushButton, QLabel, QSizePolicy,
+    QPlainTextEdit, QLineEdit, QPushButton, QLabel, QSizePolicy,
 )
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
-from PyQt5.QtGui import QFont, QTextCursor
+from PyQt5.QtGui import QFont, QColor, QTextCharFormat, QTextCursor
 
 from styles import DARK_THEME
 from alex_client import AlexClient
 from voice_engine import (
-    TTSWorker, STTWorker, get_voice_enabled, set_voice_enabled, detect_bt_sink,
+    VoiceThread, get_voice_enabled, set_voice_enabled, detect_bt_sink,
 )
 from autonomous import AutonomousPoller
 
 
 MARKER_FILE = Path.home() / ".alex" / "terminal-active"
+MAX_CHAT_BLOCKS = 1000  # oldest lines are dropped past this
+
+BANNER = r"""
+  ___   __    ____  _  _
+ / __) / /   ( ___)( \/ )
+( (__ / /_    )__)  )  ( 
+ \___)(____)  (____)(_/\_)
+"""
+TAGLINE = "ALEX Terminal v1.0 | Type a message or use /voice, /clear, /status"
 
 
-class CommandWorker(QThread):
-    """Send a message to ALEX in a background thread."""
+class ApiWorker(QThread):
+    """
+    Long-lived thread that runs queued ALEX API jobs (commands and health
+    checks), so neither pays for spawning a thread. Owns its own AlexClient
+    (one session per thread).
+    """
     response_ready = pyqtSignal(str)
     error_occurred = pyqtSignal(str)
+    health_ready = pyqtSignal(str, dict)  # (tag, health)
+    health_failed = pyqtSignal(str)  # tag
 
-    def __init__(self, client, message, parent=None):
+    def __init__(self, parent=None):
         super().__init__(parent)
-        self.client = client
-        self.message = message
+        self.client = AlexClient()
+        self._jobs = queue.Queue()
+        self._stop_event = threading.Event()
 
-    def run(self):
-        response, error = self.client.send_message(self.message)
-        if error:
-            self.error_occurred.emit(error)
-        else:
-            self.response_ready.emit(response)
+    def send(self, message):
+        self._jobs.put(("command", message))
 
+    def check_health(self, tag, retries=5, delay=2):
+        """Queue a health check; the result is emitted with `tag`."""
+        self._jobs.put(("health", (tag, retries, delay)))
 
-class HealthCheckWorker(QThread):
-    """Health check with retries."""
-    connected = pyqtSignal(dict)
-    failed = pyqtSignal()
-
-    def __init__(self, client, retries=5, delay=2, parent=None):
-        super().__init__(parent)
-        self.client = client
-        self.retries = retries
-        self.delay = delay
+    def stop(self):
+        self._stop_event.set()
+        # Fail an in-flight command/health request at once
+        self.client.abort()
+        self._jobs.put(None)
 
     def run(self):
-        for i in range(self.retries):
+        while True:
+            job = self._jobs.get()
+            if job is None or self._stop_event.is_set():
+                break
+            kind, payload = job
+            if kind == "command":
+                response, error = self.client.send_message(payload)
+                if self._stop_event.is_set():
+                    break
+                if error:
+                    self.error_occurred.emit(error)
+                else:
+                    self.response_ready.emit(response)
+            elif kind == "health":
+                self._check_health(*payload)
+        self.client.close()
+
+    def _check_health(self, tag, retries, delay):
+        for i in range(retries):
             result = self.client.health_check()
+            if self._stop_event.is_set():
+                return
             if result:
-                self.connected.emit(result)
+                self.health_ready.emit(tag, result)
+                return
+            if i < retries - 1 and self._stop_event.wait(delay):
                 return
-            if i < self.retries - 1:
-                time.sleep(self.delay)
-        self.failed.emit()
+        self.health_failed.emit(tag)
+
+
+def _char_format(color, bold=False, italic=False):
+    fmt = QTextCharFormat()
+    fmt.setForeground(QColor(color))
+    if bold:
+        fmt.setFontWeight(QFont.Bold)
+    fmt.setFontItalic(italic)
+    return fmt
 
 
 class AlexTerminal(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.client = AlexClient()
         self.voice_on = get_voice_enabled()
-        self._tts_worker = None
-        self._stt_worker = None
-        self._cmd_worker = None
-        self._health_worker = None
+        self._mic_busy = False
+        self._command_pending = False
         self._poller = None
+        self._thinking_cursor = None
 
         self._init_ui()
         self._write_marker()
+
+        self._api_worker = ApiWorker()
+        self._api_worker.response_ready.connect(self._on_response)
+        self._api_worker.error_occurred.connect(self._on_error)
+        self._api_worker.health_ready.connect(self._on_health_ready)
+        self._api_worker.health_failed.connect(self._on_health_failed)
+        self._api_worker.start()
+
+        self._voice = VoiceThread()
+        self._voice.tts_error.connect(self._on_tts_error)
+        self._voice.recording_started.connect(self._on_recording_started)
+        self._voice.recording_stopped.connect(self._on_recording_stopped)
+        self._voice.transcription_ready.connect(self._on_transcription)
+        self._voice.stt_error.connect(self._on_stt_error)
+        self._voice.start()
+
         self._start_health_check()
 
     def _init_ui(self):
@@ -123,12 +176,25 @@ class AlexTerminal(QMainWindow):
         layout.addLayout(top_bar)
 
         # --- Chat area ---
-        self.chat_area = QTextBrowser()
+        # Plain text + cached char formats: appends skip the HTML parser
+        self.chat_area = QPlainTextEdit()
         self.chat_area.setObjectName("chatArea")
-        self.chat_area.setOpenExternalLinks(True)
+        self.chat_area.setReadOnly(True)
+        self.chat_area.setMaximumBlockCount(MAX_CHAT_BLOCKS)
         self.chat_area.setFont(QFont("Monospace", 11))
         layout.addWidget(self.chat_area, stretch=1)
 
+        self._fmt_user = _char_format("#ffffff")
+        self._fmt_alex = _char_format("#00ff88")
+        # Fixed prefix runs are built once; an append only adds its text run
+        self._run_user_prefix = ("You: ", _char_format("#ffffff", bold=True))
+        self._run_alex_prefix = ("ALEX: ", _char_format("#00ff88", bold=True))
+        self._fmt_system = _char_format("#888888", italic=True)
+        self._fmt_banner = _char_format("#00ff88", bold=True)
+        self._fmt_banner.setFontPointSize(12)
+        self._fmt_banner.setFontFixedPitch(True)
+        self._fmt_tagline = _char_format("#888888")
+
         # --- Input bar ---
         input_bar = QHBoxLayout()
         input_bar.setSpacing(4)
@@ -176,10 +242,19 @@ class AlexTerminal(QMainWindow):
 
     def _start_health_check(self):
         self._append_system("Connecting to ALEX...")
-        self._health_worker = HealthCheckWorker(self.client)
-        self._health_worker.connected.connect(self._on_connected)
-        self._health_worker.failed.connect(self._on_connection_failed)
-        self._health_worker.start()
+        self._api_worker.check_health("connect")
+
+    def _on_health_ready(self, tag, health):
+        if tag == "connect":
+            self._on_connected(health)
+        else:
+            self._on_status_check(health)
+
+    def _on_health_failed(self, tag):
+        if tag == "connect":
+            self._on_connection_failed()
+        else:
+            self._on_status_failed()
 
     def _on_connected(self, health_data):
         self._set_status(True)
@@ -188,20 +263,13 @@ class AlexTerminal(QMainWindow):
         self._append_system(f"Connected to ALEX (uptime: {uptime_str})")
 
         # Welcome banner
-        self._append_html(
-            '<br>'
-            '<span style="color:#00ff88; font-size:16px; font-weight:bold;">'
-            '  ___   __    ____  _  _<br>'
-            ' / __) / /   ( ___)( \\/ )<br>'
-            '( (__ / /_    )__)  )  ( <br>'
-            ' \\___)(____)  (____)(_/\\_)<br>'
-            '</span>'
-            '<span style="color:#888;">ALEX Terminal v1.0 | '
-            'Type a message or use /voice, /clear, /status</span><br>'
-        )
+        self._append_blocks([[
+            (BANNER, self._fmt_banner),
+            (TAGLINE, self._fmt_tagline),
+        ]])
 
         # Detect Bluetooth audio
-        bt_sink = detect_bt_sink()
+        bt_sink = detect_bt_sink(refresh=True)
         if bt_sink:
             self._append_system(f"Bluetooth audio: {bt_sink}")
         else:
@@ -222,6 +290,11 @@ class AlexTerminal(QMainWindow):
     # --- Message handling ---
 
     def _on_send(self):
+        # One command (and one thinking placeholder) in flight at a time;
+        # a transcription arriving meanwhile stays in the input field
+        if self._command_pending:
+            return
+
         text = self.input_field.text().strip()
         if not text:
             return
@@ -237,15 +310,14 @@ class AlexTerminal(QMainWindow):
         self._append_user(text)
 
         # Send to ALEX
+        self._command_pending = True
         self._set_input_enabled(False)
         self._append_thinking()
 
-        self._cmd_worker = CommandWorker(self.client, text)
-        self._cmd_worker.response_ready.connect(self._on_response)
-        self._cmd_worker.error_occurred.connect(self._on_error)
-        self._cmd_worker.start()
+        self._api_worker.send(text)
 
     def _on_response(self, response):
+        self._command_pending = False
         self._remove_thinking()
         cleaned = self._clean_response(response)
         self._append_alex(cleaned)
@@ -256,6 +328,7 @@ class AlexTerminal(QMainWindow):
             self._speak(cleaned)
 
     def _on_error(self, error):
+        self._command_pending = False
         self._remove_thinking()
         self._append_system(f"Error: {error}")
         self._set_input_enabled(True)
@@ -266,23 +339,15 @@ class AlexTerminal(QMainWindow):
         command = parts[0].lower()
 
         if command == "/voice":
-            self.voice_on = not self.voice_on
-            set_voice_enabled(self.voice_on)
-            self._update_voice_btn()
-            state = "ON" if self.voice_on else "OFF"
-            self._append_system(f"Voice output {state}")
+            self._on_voice_toggle()
 
         elif command == "/clear":
             self.chat_area.clear()
+            self._thinking_cursor = None
 
         elif command == "/status":
             self._append_system("Checking ALEX status...")
-            self._health_worker = HealthCheckWorker(self.client, retries=1, delay=0)
-            self._health_worker.connected.connect(self._on_status_check)
-            self._health_worker.failed.connect(
-                lambda: (self._set_status(False), self._append_system("ALEX is offline"))
-            )
-            self._health_worker.start()
+            self._api_worker.check_health("status", retries=1, delay=0)
 
         else:
             self._append_system(f"Unknown command: {command}")
@@ -299,11 +364,17 @@ class AlexTerminal(QMainWindow):
             f"Redis: {health.get('redis', '?')}"
         )
 
+    def _on_status_failed(self):
+        self._set_status(False)
+        self._append_system("ALEX is offline")
+
     # --- Voice ---
 
     def _on_voice_toggle(self):
         self.voice_on = not self.voice_on
         set_voice_enabled(self.voice_on)
+        if not self.voice_on:
+            self._voice.cancel_speech()
         self._update_voice_btn()
         state = "ON" if self.voice_on else "OFF"
         self._append_system(f"Voice output {state}")
@@ -320,53 +391,58 @@ class AlexTerminal(QMainWindow):
         self.voice_btn.style().polish(self.voice_btn)
 
     def _speak(self, text):
-        # Don't overlap TTS
-        if self._tts_worker and self._tts_worker.isRunning():
-            return
-        self._tts_worker = TTSWorker(text)
-        self._tts_worker.error.connect(
-            lambda e: self._append_system(f"TTS error: {e}")
-        )
-        self._tts_worker.start()
+        # Queued behind any reply still playing
+        self._voice.speak(text)
+
+    def _on_tts_error(self, error):
+        self._append_system(f"TTS error: {error}")
 
     def _on_mic(self):
-        if self._stt_worker and self._stt_worker.isRunning():
+        if self._mic_busy or self._command_pending:
             return
+        self._mic_busy = True
+        # Recording starts once any queued replies have finished playing
+        self.mic_btn.setText("Waiting...")
+        self._update_mic_btn()
+        self._voice.listen()
 
-        self._stt_worker = STTWorker()
-        self._stt_worker.recording_started.connect(
-            lambda: (self.mic_btn.setText("Recording..."), self.mic_btn.setEnabled(False))
-        )
-        self._stt_worker.recording_stopped.connect(
-            lambda: (self.mic_btn.setText("Mic"), self.mic_btn.setEnabled(True))
-        )
-        self._stt_worker.transcription_ready.connect(self._on_transcription)
-        self._stt_worker.error.connect(self._on_stt_error)
-        self._stt_worker.start()
+    def _on_recording_started(self):
+        self.mic_btn.setText("Recording...")
+
+    def _on_recording_stopped(self):
+        self.mic_btn.setText("Mic")
+
+    def _update_mic_btn(self):
+        self.mic_btn.setEnabled(not self._mic_busy and not self._command_pending)
 
     def _on_transcription(self, text):
+        self._mic_busy = False
         self.mic_btn.setText("Mic")
-        self.mic_btn.setEnabled(True)
+        self._update_mic_btn()
         self.input_field.setText(text)
         # Auto-send
         self._on_send()
 
     def _on_stt_error(self, error):
+        self._mic_busy = False
         self.mic_btn.setText("Mic")
-        self.mic_btn.setEnabled(True)
+        self._update_mic_btn()
         self._append_system(f"Mic: {error}")
 
     # --- Autonomous messages ---
 
     def _start_poller(self):
         self._poller = AutonomousPoller()
-        self._poller.message_received.connect(self._on_autonomous_message)
+        self._poller.message_batch.connect(self._on_autonomous_message)
         self._poller.start()
 
-    def _on_autonomous_message(self, title, body):
-        self._append_alex(f"[{title}] {body}")
+    def _on_autonomous_message(self, batch):
+        # One insert for the whole batch instead of one per message
+        self._append_blocks([
+            self._alex_runs(f"[{title}] {body}") for title, body in batch
+        ])
         if self.voice_on:
-            self._speak(body)
+            self._speak(batch[-1][1])
 
     # --- Response cleanup ---
 
@@ -418,48 +494,69 @@ class AlexTerminal(QMainWindow):
 
     # --- Chat display helpers ---
 
-    def _append_html(self, html_str):
-        self.chat_area.moveCursor(QTextCursor.End)
-        self.chat_area.insertHtml(html_str)
+    def _append_blocks(self, blocks):
+        """
+        Append paragraphs, each a list of (text, QTextCharFormat) runs.
+        The whole call is one edit block with repaints held off, so a batch
+        costs one layout and one paint rather than one per message.
+        """
+        doc = self.chat_area.document()
+        cursor = QTextCursor(doc)
+        cursor.movePosition(QTextCursor.End)
+        self.chat_area.setUpdatesEnabled(False)
+        cursor.beginEditBlock()
+        try:
+            for runs in blocks:
+                if not doc.isEmpty():
+                    cursor.insertBlock()
+                for text, fmt in runs:
+                    cursor.insertText(text, fmt)
+        finally:
+            cursor.endEditBlock()
+            self.chat_area.setUpdatesEnabled(True)
         self.chat_area.moveCursor(QTextCursor.End)
 
     def _append_user(self, text):
-        escaped = html.escape(text)
-        self._append_html(
-            f'<p style="color:#ffffff;"><b>You:</b> {escaped}</p>'
-        )
+        self._append_blocks([[
+            self._run_user_prefix,
+            (text, self._fmt_user),
+        ]])
+
+    def _alex_runs(self, text):
+        return [self._run_alex_prefix, (text, self._fmt_alex)]
 
     def _append_alex(self, text):
-        escaped = html.escape(text)
-        # Preserve line breaks
-        escaped = escaped.replace("\n", "<br>")
-        self._append_html(
-            f'<p style="color:#00ff88;"><b>ALEX:</b> {escaped}</p>'
-        )
+        self._append_blocks([self._alex_runs(text)])
 
     def _append_system(self, text):
-        escaped = html.escape(text)
-        self._append_html(
-            f'<p style="color:#888888; font-style:italic;">{escaped}</p>'
-        )
+        self._append_blocks([[(text, self._fmt_system)]])
 
     def _append_thinking(self):
-        self._append_html(
-            '<p id="thinking" style="color:#888888; font-style:italic;">'
-            'ALEX is thinking...</p>'
-        )
+        # Keep a selection over just the placeholder. The cursor is parked at
+        # the end before inserting, so Qt shifts it when old blocks are
+        # trimmed (MAX_CHAT_BLOCKS); keepPositionOnInsert holds it in front
+        # of the placeholder, and later keeps the selection from swallowing
+        # messages appended while we wait. Qt doesn't apply that flag to the
+        # anchor, so re-anchor at the (already shifted) position afterwards.
+        cursor = QTextCursor(self.chat_area.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.setKeepPositionOnInsert(True)
+        self._append_system("ALEX is thinking...")
+        cursor.setPosition(cursor.position())
+        cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+        self._thinking_cursor = cursor
 
     def _remove_thinking(self):
-        content = self.chat_area.toHtml()
-        content = content.replace(
-            "ALEX is thinking...", ""
-        )
-        self.chat_area.setHtml(content)
+        if self._thinking_cursor is None:
+            return
+        self._thinking_cursor.removeSelectedText()
+        self._thinking_cursor = None
         self.chat_area.moveCursor(QTextCursor.End)
 
     def _set_input_enabled(self, enabled):
         self.input_field.setEnabled(enabled)
         self.send_btn.setEnabled(enabled)
+        self._update_mic_btn()
 
     # --- Marker file ---
 
@@ -481,13 +578,13 @@ class AlexTerminal(QMainWindow):
 
     def closeEvent(self, event):
         self._remove_marker()
+        self._api_worker.stop()
+        self._api_worker.wait(2000)
         if self._poller:
             self._poller.stop()
             self._poller.wait(2000)
-        if self._tts_worker and self._tts_worker.isRunning():
-            self._tts_worker.wait(2000)
-        if self._stt_worker and self._stt_worker.isRunning():
-            self._stt_worker.wait(2000)
+        self._voice.stop()
+        self._voice.wait(2000)
         event.accept()
 
 
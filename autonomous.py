@@ -1,62 +1,136 @@
 """
 ALEX Terminal - Autonomous Message Poller
-Polls for proactive messages from ALEX (heartbeat tasks, alerts, etc.)
+Long-polls for proactive messages from ALEX (heartbeat tasks, alerts, etc.)
+and watches the file-based queue for changes.
 """
 
+import os
 import json
+import time
+import threading
 from pathlib import Path
 
-from PyQt5.QtCore import QThread, pyqtSignal, QTimer
+from PyQt5.QtCore import QThread, pyqtSignal, QTimer, QFileSystemWatcher
 
 from alex_client import AlexClient
 
 
 QUEUE_FILE = Path.home() / ".alex" / "terminal-queue.json"
-POLL_INTERVAL_MS = 5000  # 5 seconds
+DRAINING_FILE = QUEUE_FILE.with_suffix(".draining")
+PARTIAL_WRITE_GRACE = 5  # seconds to wait on a half-written queue file
+QUEUE_FILE_CHECK_MS = 60000  # safety net in case a watcher event is missed
+POLL_INTERVAL_MS = 5000  # floor between polls when the server answers at once
+LONG_POLL_WAIT = 25  # seconds the server may hold a poll open
+LONG_POLL_IDLE_WAIT = 60  # used once ALEX has been quiet for a while
+IDLE_POLLS_BEFORE_BACKOFF = 3
 
 
 class AutonomousPoller(QThread):
-    """Polls for autonomous messages from ALEX."""
-    message_received = pyqtSignal(str, str)  # (title, body)
+    """
+    Polls the API for autonomous messages from ALEX on its own thread.
+    The queue file is watched (inotify) from the thread that created the
+    poller, so it is only read when something actually touches it.
+    """
+    message_batch = pyqtSignal(list)  # [(title, body), ...]
 
     def __init__(self, parent=None):
         super().__init__(parent)
-        self._running = False
+        self._stop_event = threading.Event()
+        # Own client (and session) - requests.Session is not thread-safe
         self._client = AlexClient()
 
+        # Watch the directory: the queue file is drained by moving it away,
+        # so every new batch shows up as the file being created
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.addPath(str(QUEUE_FILE.parent))
+        self._watcher.directoryChanged.connect(self._check_queue_file)
+
+        self._queue_timer = QTimer(self)
+        self._queue_timer.timeout.connect(self._check_queue_file)
+        self._queue_timer.start(QUEUE_FILE_CHECK_MS)
+
+        # Drain anything queued before we started, once signals are connected
+        QTimer.singleShot(0, self._check_queue_file)
+
     def run(self):
-        self._running = True
-        while self._running:
-            self._poll()
-            self.msleep(POLL_INTERVAL_MS)
+        wait = LONG_POLL_WAIT
+        idle_polls = 0
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            if self._poll(wait):
+                idle_polls = 0
+                wait = LONG_POLL_WAIT
+                continue
+
+            idle_polls += 1
+            if idle_polls >= IDLE_POLLS_BEFORE_BACKOFF:
+                wait = LONG_POLL_IDLE_WAIT
+
+            # A server without long-poll support answers immediately;
+            # keep the old fixed interval so we never spin.
+            elapsed_ms = int((time.monotonic() - started) * 1000)
+            if elapsed_ms < POLL_INTERVAL_MS:
+                # One wakeup per interval; stop() ends the wait early
+                self._stop_event.wait((POLL_INTERVAL_MS - elapsed_ms) / 1000)
+        self._client.close()
 
     def stop(self):
-        self._running = False
+        self._stop_event.set()
+        self._queue_timer.stop()
+        # Unblock a pending long-poll so the thread exits promptly
+        self._client.abort()
 
-    def _poll(self):
-        """Check both the file queue and the API endpoint."""
-        # 1. Try API endpoint first
+    def _poll(self, wait=0):
+        """Long-poll the API endpoint and emit everything found as one batch.
+        Returns True if anything was emitted."""
         try:
-            messages = self._client.get_terminal_messages()
-            for msg in messages:
-                title = msg.get("title", "ALEX")
-                body = msg.get("body", msg.get("text", ""))
-                if body:
-                    self.message_received.emit(title, body)
+            pending = _unpack(self._client.get_terminal_messages(wait))
         except Exception:
-            pass
+            pending = []
+
+        if pending:
+            self.message_batch.emit(pending)
+        return bool(pending)
+
+    def _check_queue_file(self, _path=None):
+        """Drain the file-based queue (fallback)."""
+        # Atomically move the queue aside: a producer writing after this
+        # starts a fresh file instead of racing our read-then-clear
+        if not DRAINING_FILE.exists():
+            try:
+                os.replace(QUEUE_FILE, DRAINING_FILE)
+            except OSError:
+                return
 
-        # 2. Also check file-based queue (fallback)
         try:
-            if QUEUE_FILE.exists():
-                data = json.loads(QUEUE_FILE.read_text())
-                if isinstance(data, list) and data:
-                    # Clear the file first, then emit
-                    QUEUE_FILE.write_text("[]")
-                    for msg in data:
-                        title = msg.get("title", "ALEX")
-                        body = msg.get("body", msg.get("text", ""))
-                        if body:
-                            self.message_received.emit(title, body)
-        except (json.JSONDecodeError, OSError):
-            pass
+            data = json.loads(DRAINING_FILE.read_text())
+        except json.JSONDecodeError:
+            # The producer may still be writing through its open handle;
+            # give it a moment, but don't hang on to a corrupt file forever
+            try:
+                age = time.time() - DRAINING_FILE.stat().st_mtime
+            except OSError:
+                return
+            if age < PARTIAL_WRITE_GRACE:
+                QTimer.singleShot(500, self._check_queue_file)
+            else:
+                DRAINING_FILE.unlink(missing_ok=True)
+            return
+        except OSError:
+            return
+
+        DRAINING_FILE.unlink(missing_ok=True)
+        if isinstance(data, list) and data:
+            pending = _unpack(data)
+            if pending:
+                self.message_batch.emit(pending)
+
+
+def _unpack(messages):
+    """Turn raw message dicts into (title, body) pairs, skipping empty ones."""
+    pending = []
+    for msg in messages:
+        body = msg.get("body", msg.get("text", ""))
+        if body:
+            pending.append((msg.get("title", "ALEX"), body))
+    return pending
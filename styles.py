@@ -27,7 +27,7 @@ QLabel#statusDot {
 }
 
 /* Chat area */
-QTextBrowser#chatArea {
+QPlainTextEdit#chatArea {
     background-color: #0f0f23;
     color: #e0e0e0;
     border: 1px solid #2a2a4a;
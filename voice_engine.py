@@ -3,20 +3,44 @@ ALEX Terminal - Voice Engine (TTS + STT)
 Reuses the proven pattern from voice_agent.py.
 """
 
+import io
 import os
 import json
+import wave
+import queue
 import subprocess
-import tempfile
+import collections
+import threading
+import time
 from pathlib import Path
 
+import httpx
 from dotenv import load_dotenv
 from openai import OpenAI
 from PyQt5.QtCore import QThread, pyqtSignal
 
+try:
+    import webrtcvad
+except ImportError:  # optional - without it we record fixed-length clips
+    webrtcvad = None
+
 
 # Load OpenAI key from ~/.env
 load_dotenv(Path.home() / ".env")
 
+# Shared client so TTS/STT calls reuse one connection pool (no TLS handshake
+# per call). None when no key is configured. The SDK default (600 s, 2
+# retries) would leave VoiceThread.stop() waiting on a stalled TTS/Whisper
+# request for half an hour, so keep both tight.
+OPENAI_TIMEOUT = httpx.Timeout(30, connect=5)
+OPENAI_MAX_RETRIES = 1
+
+_api_key = os.getenv("OPENAI_API_KEY")
+_openai_client = (
+    OpenAI(api_key=_api_key, timeout=OPENAI_TIMEOUT, max_retries=OPENAI_MAX_RETRIES)
+    if _api_key else None
+)
+
 CONFIG_DIR = Path.home() / ".alex"
 CONFIG_FILE = CONFIG_DIR / "terminal-config.json"
 
@@ -28,6 +52,28 @@ MIC_FORMAT = "S16_LE"
 MIC_DURATION = 5
 MIN_AUDIO_SIZE = 1000  # bytes - filter out silence
 
+# Voice activity detection (only used when webrtcvad is installed)
+VAD_AGGRESSIVENESS = 2  # 0-3, higher filters more non-speech
+VAD_FRAME_MS = 20
+VAD_PREROLL_MS = 200
+VAD_TRAILING_SILENCE_MS = 500
+VAD_MIN_SPEECH_MS = 150  # less than this is a click or bump, not speech
+VAD_MAX_DURATION = 8  # seconds
+
+# MP3 players that can read from stdin, in order of preference
+PLAYER_COMMANDS = [
+    ["mpg123", "-q", "-"],
+    ["ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet", "-i", "pipe:0"],
+]
+
+VOICE_QUEUE_SIZE = 4  # pending voice jobs; oldest dropped beyond this
+
+BT_SINK_TTL = 30  # seconds before re-running pactl to look for the speaker
+
+_bt_sink_cache = {"name": None, "ts": None}
+_default_sink = None  # last sink we set as default
+_sink_lock = threading.Lock()
+
 
 def _load_config():
     try:
@@ -46,18 +92,39 @@ def _save_config(data):
         pass
 
 
-def get_voice_enabled():
-    return _load_config().get("voice_enabled", True)
+# Read once at import; only writes go back to disk
+_config_cache = _load_config()
 
 
-def set_voice_enabled(enabled):
-    cfg = _load_config()
-    cfg["voice_enabled"] = enabled
-    _save_config(cfg)
+def get_voice_enabled():
+    return _config_cache.get("voice_enabled", True)
 
 
-def detect_bt_sink():
-    """Detect the K07 Bluetooth speaker sink via pactl."""
+def set_voice_enabled(enabled):
+    _config_cache["voice_enabled"] = enabled
+    _save_config(_config_cache)
+
+
+def detect_bt_sink(refresh=False):
+    """
+    Detect the K07 Bluetooth speaker sink. The pactl lookup is cached for
+    BT_SINK_TTL seconds so TTS doesn't fork a process per utterance.
+    """
+    global _default_sink
+    with _sink_lock:
+        ts = _bt_sink_cache["ts"]
+        if not refresh and ts is not None and time.monotonic() - ts < BT_SINK_TTL:
+            return _bt_sink_cache["name"]
+        name = _query_bt_sink()
+        if name is None or name != _bt_sink_cache["name"]:
+            # Speaker gone or reconnected - make the next set go to pactl
+            _default_sink = None
+        _bt_sink_cache["name"] = name
+        _bt_sink_cache["ts"] = time.monotonic()
+        return name
+
+
+def _query_bt_sink():
     try:
         result = subprocess.run(
             ["pactl", "list", "short", "sinks"],
@@ -74,139 +141,313 @@ def detect_bt_sink():
 
 
 def set_default_sink(sink_name):
-    """Set PipeWire/PulseAudio default sink."""
-    try:
-        subprocess.run(
-            ["pactl", "set-default-sink", sink_name],
-            capture_output=True, timeout=5,
-        )
+    """Set PipeWire/PulseAudio default sink (skipped if we already did)."""
+    global _default_sink
+    with _sink_lock:
+        if sink_name == _default_sink:
+            return True
+        try:
+            result = subprocess.run(
+                ["pactl", "set-default-sink", sink_name],
+                capture_output=True, timeout=5,
+            )
+        except Exception:
+            return False
+        if result.returncode != 0:
+            return False
+        _default_sink = sink_name
         return True
-    except Exception:
-        return False
 
 
-class TTSWorker(QThread):
-    """Generate and play TTS audio in a background thread."""
-    finished = pyqtSignal()
-    error = pyqtSignal(str)
+def _start_player(spawn=subprocess.Popen):
+    """Start the first available MP3 player reading from stdin, or None."""
+    for cmd in PLAYER_COMMANDS:
+        try:
+            return spawn(cmd, stdin=subprocess.PIPE)
+        except FileNotFoundError:
+            continue
+    return None
+
 
-    def __init__(self, text, parent=None):
+def _record_clip(spawn=subprocess.Popen):
+    """Record a fixed MIC_DURATION clip. Returns (wav_bytes, error)."""
+    # WAV on stdout - nothing touches the SD card
+    cmd = [
+        "arecord",
+        "-D", MIC_DEVICE,
+        "-f", MIC_FORMAT,
+        "-r", str(MIC_SAMPLE_RATE),
+        "-c", str(MIC_CHANNELS),
+        "-d", str(MIC_DURATION),
+        "-t", "wav",
+        "-",
+    ]
+    proc = spawn(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        stdout, stderr = proc.communicate(timeout=MIC_DURATION + 3)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+        raise
+
+    if proc.returncode != 0:
+        return None, f"Recording failed: {stderr.decode(errors='replace')}"
+    if len(stdout) < MIN_AUDIO_SIZE:
+        return None, "No speech detected"
+    return stdout, None
+
+
+def _record_until_silence(spawn=subprocess.Popen):
+    """
+    Record raw PCM until VAD_TRAILING_SILENCE_MS of silence follows speech
+    (capped at VAD_MAX_DURATION). Returns (wav_bytes, error).
+    """
+    vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
+    frame_bytes = MIC_SAMPLE_RATE * VAD_FRAME_MS // 1000 * 2 * MIC_CHANNELS
+    max_frames = VAD_MAX_DURATION * 1000 // VAD_FRAME_MS
+    silence_limit = VAD_TRAILING_SILENCE_MS // VAD_FRAME_MS
+
+    cmd = [
+        "arecord",
+        "-q",
+        "-D", MIC_DEVICE,
+        "-f", MIC_FORMAT,
+        "-r", str(MIC_SAMPLE_RATE),
+        "-c", str(MIC_CHANNELS),
+        "-t", "raw",
+        "-",
+    ]
+    proc = spawn(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # Short pre-roll so the first syllable isn't clipped
+    preroll = collections.deque(maxlen=VAD_PREROLL_MS // VAD_FRAME_MS)
+    frames = []
+    silent = 0
+    speech_frames = 0
+    try:
+        for _ in range(max_frames):
+            frame = proc.stdout.read(frame_bytes)
+            if len(frame) < frame_bytes:
+                break
+            speech = vad.is_speech(frame, MIC_SAMPLE_RATE)
+            if not frames:
+                if not speech:
+                    preroll.append(frame)
+                    continue
+                frames.extend(preroll)
+            frames.append(frame)
+            if speech:
+                speech_frames += 1
+                silent = 0
+            else:
+                silent += 1
+            if silent >= silence_limit:
+                break
+    finally:
+        proc.terminate()
+        _, stderr = proc.communicate(timeout=3)
+
+    if not frames:
+        if not preroll and stderr:
+            return None, f"Recording failed: {stderr.decode(errors='replace')}"
+        return None, "No speech detected"
+    if speech_frames * VAD_FRAME_MS < VAD_MIN_SPEECH_MS:
+        # Whisper tends to invent text for near-silent clips
+        return None, "No speech detected"
+
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(MIC_CHANNELS)
+        wav.setsampwidth(2)  # S16_LE
+        wav.setframerate(MIC_SAMPLE_RATE)
+        wav.writeframes(b"".join(frames))
+    return buf.getvalue(), None
+
+
+class VoiceThread(QThread):
+    """
+    Long-lived thread that runs TTS and STT jobs in order, so an utterance
+    doesn't pay for spawning a thread and successive replies queue up
+    instead of being dropped.
+    """
+    tts_error = pyqtSignal(str)
+    transcription_ready = pyqtSignal(str)
+    stt_error = pyqtSignal(str)
+    recording_started = pyqtSignal()
+    recording_stopped = pyqtSignal()
+
+    def __init__(self, parent=None):
         super().__init__(parent)
-        self.text = text
-        self._client = None
+        self._jobs = queue.Queue(maxsize=VOICE_QUEUE_SIZE)
+        self._proc = None  # current mpg123/ffplay/arecord, killed by stop()
+        self._proc_lock = threading.Lock()
+        self._stopping = False
+        self._player = None  # mpg123/ffplay for the reply playing now
+        self._tts_generation = 0  # bumped by cancel_speech()
+
+    def speak(self, text):
+        self._submit(("tts", text))
+
+    def listen(self):
+        self._submit(("stt", None))
+
+    def stop(self):
+        """Drop pending jobs and cut off the current one so wait() returns."""
+        with self._proc_lock:
+            self._stopping = True
+            proc = self._proc
+        while True:
+            try:
+                self._jobs.get_nowait()
+            except queue.Empty:
+                break
+        self._jobs.put_nowait(None)
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+
+    def cancel_speech(self):
+        """Drop queued replies and cut off the one playing; mic jobs stay."""
+        kept = []
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is None or job[0] != "tts":
+                kept.append(job)
+        for job in kept:
+            self._jobs.put_nowait(job)
+
+        with self._proc_lock:
+            self._tts_generation += 1
+            player = self._player
+        if player is not None and player.poll() is None:
+            player.kill()
+
+    def _spawn(self, cmd, **kwargs):
+        """Popen that stop() knows how to kill."""
+        with self._proc_lock:
+            if self._stopping:
+                raise RuntimeError("Voice engine stopped")
+            self._proc = subprocess.Popen(cmd, **kwargs)
+            return self._proc
+
+    def _emit_error(self, signal, message):
+        # Errors caused by stop() killing a job aren't worth reporting
+        if not self._stopping:
+            signal.emit(message)
+
+    def _submit(self, job):
+        # Drop the oldest job rather than let a chatty ALEX back up audio
+        while True:
+            try:
+                self._jobs.put_nowait(job)
+                return
+            except queue.Full:
+                try:
+                    dropped = self._jobs.get_nowait()
+                except queue.Empty:
+                    continue
+                if dropped and dropped[0] == "stt":
+                    self.stt_error.emit("Mic request dropped")
 
     def run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            kind, payload = job
+            if kind == "tts":
+                self._speak(payload)
+            elif kind == "stt":
+                self._listen()
+
+    def _speak(self, text):
+        """Generate and play TTS audio."""
+        generation = self._tts_generation
         try:
-            api_key = os.getenv("OPENAI_API_KEY")
-            if not api_key:
-                self.error.emit("OpenAI API key not configured")
+            if _openai_client is None:
+                self._emit_error(self.tts_error, "OpenAI API key not configured")
                 return
 
-            self._client = OpenAI(api_key=api_key)
-
-            # Generate speech
-            response = self._client.audio.speech.create(
-                model="tts-1",
-                voice="onyx",
-                input=self.text[:4096],  # API limit
-            )
+            # Route to BT speaker if available
+            bt_sink = detect_bt_sink()
+            if bt_sink:
+                set_default_sink(bt_sink)
+
+            # Play via mpg123 -> ffplay fallback, fed straight from the
+            # API stream so playback starts before the download finishes
+            player = _start_player(self._spawn)
+            if player is None:
+                self._emit_error(
+                    self.tts_error, "No audio player found (install mpg123 or ffmpeg)"
+                )
+                return
+            with self._proc_lock:
+                if generation != self._tts_generation:
+                    # Voice was switched off while we were starting up
+                    player.kill()
+                    return
+                self._player = player
 
-            # Write to temp file
-            tmp = tempfile.NamedTemporaryFile(suffix=".mp3", delete=False)
-            tmp_path = tmp.name
             try:
-                tmp.write(response.content)
-                tmp.close()
-
-                # Route to BT speaker if available
-                bt_sink = detect_bt_sink()
-                if bt_sink:
-                    set_default_sink(bt_sink)
-
-                # Play via mpg123 -> ffplay fallback
-                try:
-                    subprocess.run(
-                        ["mpg123", "-q", tmp_path],
-                        check=True, timeout=60,
-                    )
-                except (FileNotFoundError, subprocess.CalledProcessError):
-                    try:
-                        subprocess.run(
-                            ["ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet", tmp_path],
-                            check=True, timeout=60,
-                        )
-                    except FileNotFoundError:
-                        self.error.emit("No audio player found (install mpg123 or ffmpeg)")
+                with _openai_client.audio.speech.with_streaming_response.create(
+                    model="tts-1",
+                    voice="onyx",
+                    input=text[:4096],  # API limit
+                ) as response:
+                    for chunk in response.iter_bytes(chunk_size=4096):
+                        if self._stopping or generation != self._tts_generation:
+                            break
+                        player.stdin.write(chunk)
+                player.stdin.close()
+                player.wait(timeout=60)
             finally:
-                if os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
-
-            self.finished.emit()
+                with self._proc_lock:
+                    self._player = None
+                if player.poll() is None:
+                    player.kill()
 
         except Exception as e:
-            self.error.emit(str(e))
-
-
-class STTWorker(QThread):
-    """Record from USB mic, transcribe via Whisper, return text."""
-    transcription_ready = pyqtSignal(str)
-    error = pyqtSignal(str)
-    recording_started = pyqtSignal()
-    recording_stopped = pyqtSignal()
+            # Killed by cancel_speech() - not an error worth showing
+            if generation == self._tts_generation:
+                self._emit_error(self.tts_error, str(e))
 
-    def run(self):
-        tmp_path = None
+    def _listen(self):
+        """Record from USB mic, transcribe via Whisper, emit the text."""
         try:
-            api_key = os.getenv("OPENAI_API_KEY")
-            if not api_key:
-                self.error.emit("OpenAI API key not configured")
+            if _openai_client is None:
+                self._emit_error(self.stt_error, "OpenAI API key not configured")
                 return
 
-            # Record audio
-            tmp = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-            tmp_path = tmp.name
-            tmp.close()
-
-            cmd = [
-                "arecord",
-                "-D", MIC_DEVICE,
-                "-f", MIC_FORMAT,
-                "-r", str(MIC_SAMPLE_RATE),
-                "-c", str(MIC_CHANNELS),
-                "-d", str(MIC_DURATION),
-                tmp_path,
-            ]
-
             self.recording_started.emit()
-            result = subprocess.run(cmd, capture_output=True, timeout=MIC_DURATION + 3)
+            if webrtcvad is not None:
+                audio, error = _record_until_silence(self._spawn)
+            else:
+                audio, error = _record_clip(self._spawn)
             self.recording_stopped.emit()
 
-            if result.returncode != 0:
-                self.error.emit(f"Recording failed: {result.stderr.decode(errors='replace')}")
+            if error:
+                self._emit_error(self.stt_error, error)
                 return
-
-            if not os.path.exists(tmp_path) or os.path.getsize(tmp_path) < MIN_AUDIO_SIZE:
-                self.error.emit("No speech detected")
+            if self._stopping:
                 return
 
             # Transcribe
-            client = OpenAI(api_key=api_key)
-            with open(tmp_path, "rb") as audio_file:
-                transcript = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    language="en",
-                )
+            audio_file = io.BytesIO(audio)
+            audio_file.name = "mic.wav"
+            transcript = _openai_client.audio.transcriptions.create(
+                model="whisper-1",
+                file=audio_file,
+                language="en",
+            )
 
             text = transcript.text.strip()
             if len(text) < 2:
-                self.error.emit("No speech detected")
+                self._emit_error(self.stt_error, "No speech detected")
                 return
 
             self.transcription_ready.emit(text)
 
         except Exception as e:
-            self.error.emit(str(e))
-        finally:
-            if tmp_path and os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+            self._emit_error(self.stt_error, str(e))